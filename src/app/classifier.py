@@ -71,6 +71,11 @@ def normalize_source_url(source, url_pattern, ip_pattern):
     return source
 
 
+# 排序键：名称 → 响应时间 → URL，保证排序结果与输入顺序无关
+def sort_key(item):
+    return (item.book_source_name.lower(), item.respond_time, item.book_source_url)
+
+
 # 分类并排序书源：返回分组、有域名的有效书源、无效书源
 def classify_and_sort_sources(sources, config):
     # 构建分类正则模式
@@ -96,9 +101,6 @@ def classify_and_sort_sources(sources, config):
         else:
             invalid_sources.append(source)
 
-    def sort_key(item):
-        return (item.book_source_name.lower(), item.respond_time)
-
     valid_sources.sort(key=sort_key)
     invalid_sources.sort(key=sort_key)
     return grouped, valid_sources, invalid_sources
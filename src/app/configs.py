@@ -1,4 +1,5 @@
 import msgspec
+from typing import Literal
 
 
 # 工具函数：定义字段别名和默认值
@@ -14,6 +15,27 @@ class HttpConfig(msgspec.Struct):
     max_redirects: int = alias("最大重定向次数", 3)  # 最大重定向次数
     verify: bool = alias("验证SSL证书", False)  # 是否验证 SSL
     trust_env: bool = alias("使用系统代理", True)  # 是否使用系统代理
+    # 探测模式：get=完整读取，head=仅检测存活，range=只读取前 N KB
+    probe_mode: Literal["get", "head", "range"] = alias("探测模式", "get")
+    range_kb: int = alias("分段读取大小(KB)", 64)  # range 模式读取上限
+    http2: bool = alias("启用HTTP2", False)  # 同域名书源复用连接
+    # 代理池：http://、socks5:// 代理，请求分散到各个代理
+    proxies: list[str] = msgspec.field(name="代理池", default_factory=list)
+    proxy_max_failures: int = alias("代理连续失败剔除次数", 5)  # 连续无法连接代理后剔除
+    proxy_slow_ms: int = alias("慢代理阈值(毫秒)", 3000)  # 超过且远慢于其他代理时剔除
+    proxy_cooldown: float = alias("代理冷却时间(秒)", 30)  # 剔除后重新加入的等待时间
+    # 调度策略：none=按原顺序，slow_first=慢的先提交，lane=慢的使用独立通道
+    # （其他线程空闲后也处理慢速通道，预计不比 slow_first 快时自动改用 slow_first）
+    schedule: Literal["none", "slow_first", "lane"] = alias("调度策略", "slow_first")
+    slow_lane_workers: int = alias("慢速通道并发数上限", 32)  # 从总并发数中划出
+    slow_threshold: int = alias("慢速阈值(毫秒)", 500)  # 预计耗时超过后进入慢速通道
+    # 瞬时错误（握手超时、连接重置等）重试，总次数受全局预算限制
+    retry_count: int = alias("瞬时错误重试次数", 1)  # 单个书源最多重试次数
+    retry_budget: float = alias("重试预算比例", 0.1)  # 重试总数 ≤ 书源数 × 比例
+    # 对冲请求：首次请求超过本次运行的延迟百分位仍未返回时，再发一次请求
+    hedge: bool = alias("启用对冲请求", True)  # 是否启用对冲请求
+    hedge_percentile: float = alias("对冲延迟百分位", 95)  # 触发对冲的延迟百分位
+    hedge_budget: float = alias("对冲预算比例", 0.05)  # 对冲总数 ≤ 书源数 × 比例
     user_agent: str = alias(  # 请求头 UA
         "请求头",
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
@@ -21,6 +43,22 @@ class HttpConfig(msgspec.Struct):
     )
 
 
+# ---- 规则检测配置 ----
+class RuleCheckConfig(msgspec.Struct):
+    keyword: str = alias("测试关键词", "斗罗大陆")  # 搜索测试关键词
+    max_workers: int = alias("并发线程数", 32)  # 并发线程数
+    max_kb: int = alias("读取大小上限(KB)", 512)  # 搜索结果读取上限，同时限制解析耗时
+    parse_timeout: int = alias("解析超时(毫秒)", 200)  # 超过后跳过后续解析
+    max_items: int = alias("检测条目数", 5)  # 最多检测的搜索结果条目数
+
+
+# ---- 分片配置 ----
+class ShardConfig(msgspec.Struct):
+    count: int = alias("分片总数", 1)  # 大于 1 时只检测当前分片
+    index: int = alias("当前分片序号", 0)  # 从 0 开始
+    merge: bool = alias("合并分片结果", False)  # 合并 分片/ 目录下的结果并导出
+
+
 # ---- 分类配置 ----
 class ClassificationConfig(msgspec.Struct):
     # 类型映射：小说=0，音频=1，漫画=2，文件=3，视频=4
@@ -109,6 +147,7 @@ class UrlFilterConfig(msgspec.Struct):
 class AppConfig(msgspec.Struct):
     use_format: bool = alias("格式化导出JSON", True)  # 导出 JSON 是否格式化
     url_check: bool = alias("启用URL检测", True)  # 是否启用 URL 检测
+    rule_check: bool = alias("启用规则检测", False)  # 是否检测搜索规则
     use_slice: bool = alias("启用切片保存", True)  # 是否启用切片保存
     auto_close: bool = alias("程序自动关闭", False)  # 程序结束是否自动关闭
     clear_output: bool = alias("导出前清空目录", True)  # 导出前是否清空目录
@@ -127,6 +166,10 @@ class AppConfig(msgspec.Struct):
 
     # 子配置对象
     http: HttpConfig = msgspec.field(name="连接测试", default_factory=HttpConfig)
+    rules: RuleCheckConfig = msgspec.field(
+        name="规则检测", default_factory=RuleCheckConfig
+    )
+    shard: ShardConfig = msgspec.field(name="分片", default_factory=ShardConfig)
     url_filter: UrlFilterConfig = msgspec.field(
         name="网页过滤", default_factory=UrlFilterConfig
     )
@@ -4,7 +4,7 @@ import sys
 import orjson
 import msgspec
 from pathlib import Path
-from models import BookSource
+from models import BookSource, HistoryEntry, ShardResult
 from configs import AppConfig
 
 
@@ -61,6 +61,48 @@ def load_sources():
     return sources
 
 
+# 加载检测记录（检测记录.json）
+def load_history():
+    file_path = base_dir() / "检测记录.json"
+    if not file_path.exists():
+        return {}
+    try:
+        return msgspec.json.decode(file_path.read_bytes(), type=dict[str, HistoryEntry])
+    except (OSError, msgspec.DecodeError) as e:
+        print(f"读取 {file_path.name} 失败: {e}")
+        return {}
+
+
+# 保存检测记录（紧凑格式）
+def save_history(history):
+    file_path = base_dir() / "检测记录.json"
+    try:
+        file_path.write_bytes(msgspec.json.encode(history))
+    except OSError as e:
+        print(f"文件写入失败 {file_path}: {e}")
+
+
+# 保存分片结果（分片/分片_序号_总数.json，紧凑格式）
+def save_shard(result):
+    shard_path = base_dir() / "分片"
+    shard_path.mkdir(parents=True, exist_ok=True)
+    file_path = shard_path / f"分片_{result.index:02d}_{result.count:02d}.json"
+    file_path.write_bytes(msgspec.json.encode(result))
+    return file_path
+
+
+# 加载全部分片结果（分片/*.json）
+def load_shards():
+    results = []
+    for file_path in sorted((base_dir() / "分片").glob("*.json")):
+        try:
+            data = msgspec.json.decode(file_path.read_bytes(), type=ShardResult)
+            results.append(data)
+        except (OSError, msgspec.DecodeError) as e:
+            print(f"读取 {file_path.name} 失败: {e}")
+    return results
+
+
 # 清空导出目录
 def clear_output(config):
     output_path = base_dir() / "导出"
@@ -136,6 +178,7 @@ def save_sources_grouped(context, config):
     save_sources(output_path / "空链", context.invalid, config)
     save_sources(output_path / "超时", context.unreachable, config)
     save_sources(output_path / "重复", context.duplicates, config)
+    save_sources(output_path / "规则失效", context.rule_failed, config)
 
     groups = group_sources(context.valid, config)
     if config.save_by_category and config.save_by_type:
@@ -6,11 +6,42 @@ from pipeline import (
     LoadStep,
     ClassifyStep,
     UrlCheckStep,
+    RuleCheckStep,
     DedupeStep,
     SaveStep,
+    ShardStep,
+    ShardSaveStep,
+    MergeShardsStep,
 )
 
 
+# 按配置选择流水线步骤：单机 / 分片检测 / 合并分片
+def build_steps(config):
+    if config.shard.merge:
+        return [
+            MergeShardsStep(),  # 合并分片结果
+            DedupeStep(),  # 域名去重
+            SaveStep(),  # 保存结果
+        ]
+    if config.shard.count > 1:
+        return [
+            LoadStep(),  # 加载书源
+            ClassifyStep(),  # 分类书源
+            ShardStep(),  # 筛选当前分片
+            UrlCheckStep(),  # URL 检测（并发请求）
+            RuleCheckStep(),  # 规则检测（搜索测试）
+            ShardSaveStep(),  # 保存分片结果
+        ]
+    return [
+        LoadStep(),  # 加载书源
+        ClassifyStep(),  # 分类书源
+        UrlCheckStep(),  # URL 检测（并发请求）
+        RuleCheckStep(),  # 规则检测（搜索测试）
+        DedupeStep(),  # 域名去重
+        SaveStep(),  # 保存结果
+    ]
+
+
 # 程序入口函数
 def run():
     # 1. 加载配置（配置.json）
@@ -18,15 +49,7 @@ def run():
     # 2. 初始化上下文（保存书源、分类结果等）
     context = PipelineContext()
     # 3. 构建流水线（按顺序执行各步骤）
-    pipeline = Pipeline(
-        [
-            LoadStep(),  # 加载书源
-            ClassifyStep(),  # 分类书源
-            UrlCheckStep(),  # URL 检测（并发请求）
-            DedupeStep(),  # 域名去重
-            SaveStep(),  # 保存结果
-        ]
-    )
+    pipeline = Pipeline(build_steps(config))
     # 4. 执行流水线
     pipeline.run(context, config)
     # 5. 如果未开启自动关闭 → 等待用户按键
@@ -100,3 +100,38 @@ class BookSource(BaseModel, kw_only=True, dict=True):
         # 初始化时附加字段
         self.domain: str = ""
         self.primary_category: str = ""
+        self.bytes_received: int = 0  # 检测时传输的字节数
+        self.check_time: int = 0  # 检测总耗时（毫秒，包含重试）
+        self.timed_out: bool = False  # 检测是否以超时结束
+
+
+# ---- 检测记录（用于安排检测顺序） ----
+
+
+# 单个书源的历史检测记录（紧凑的数组格式）
+class HistoryEntry(msgspec.Struct, array_like=True):
+    latency: float | None = None  # 检测耗时的滑动平均（毫秒）
+    timeout_rate: float = 0.0  # 超时概率的滑动平均
+    checks: int = 0  # 检测次数
+
+
+# ---- 分片结果（分布式检测的中间文件） ----
+
+
+# 分片条目：书源及分类时附加的字段（紧凑的数组格式）
+class ShardItem(msgspec.Struct, array_like=True):
+    source: BookSource
+    domain: str = ""
+    primary_category: str = ""
+
+
+# 单个分片的检测结果（去重前）
+class ShardResult(msgspec.Struct, kw_only=True):
+    index: int  # 分片序号
+    count: int  # 分片总数
+    total: int  # 全部分片的书源总数
+    digest: str  # 输入书源的摘要（用于识别同一批书源）
+    valid: list[ShardItem] = []  # 有效书源
+    invalid: list[ShardItem] = []  # 其他书源（无域名）
+    unreachable: list[ShardItem] = []  # 无效书源
+    rule_failed: list[ShardItem] = []  # 规则失效书源
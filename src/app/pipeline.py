@@ -1,7 +1,18 @@
 import time
 from classifier import classify_and_sort_sources
 from url_checker import check_urls_parallel, deduplicate_by_domain
-from file_manager import base_dir, load_sources, save_sources_grouped
+from scheduler import update_history
+from rule_checker import check_rules_parallel
+from shard import split_shard, pack_shard, merge_shards
+from file_manager import (
+    base_dir,
+    load_history,
+    load_sources,
+    save_history,
+    load_shards,
+    save_shard,
+    save_sources_grouped,
+)
 
 
 # 上下文：保存整个流程的数据
@@ -12,6 +23,7 @@ class PipelineContext:
         self.valid = []  # 有效书源（有域名）
         self.invalid = []  # 其他书源（无域名）
         self.unreachable = []  # 无效书源（域名无法访问或被排除）
+        self.rule_failed = []  # 规则失效书源（搜索规则提取不到书籍）
         self.duplicates = []  # 重复书源（同域名）
         self.stats = {}  # 统计信息（可扩展）
 
@@ -82,12 +94,56 @@ class UrlCheckStep(Step):
     requires = ["url_check"]  # 依赖配置开关
 
     def run(self, context, config):
-        reachable, unreachable = check_urls_parallel(context.valid, config)
+        history = load_history()
+        sources = context.valid
+        reachable, unreachable, stats = check_urls_parallel(sources, config, history)
         context.valid, context.unreachable = reachable, unreachable
-        return f"书源检测完成，可用：{len(reachable)}，无效：{len(unreachable)}"
+        save_history(update_history(history, sources))
+        context.stats["url_check"] = stats
+        lines = [
+            f"书源检测完成，可用：{len(reachable)}，无效：{len(unreachable)}",
+            f"探测模式：{stats['probe_mode']}，HTTP/2：{stats['http2']}，"
+            f"流量：{stats['bytes_received'] / 1024:.1f} KB"
+            f"（未采用的尝试 {stats['bytes_unused'] / 1024:.1f} KB），"
+            f"平均响应：{stats['avg_respond_time']} ms",
+            f"重试：{stats['retries']}，对冲：{stats['hedges']}"
+            f"（对冲先返回：{stats['hedge_wins']}），"
+            f"检测耗时：{stats['makespan']:.2f}s",
+            f"调度策略：{stats['schedule']}（历史记录 {stats['history_hits']} 条，"
+            f"慢速通道 {stats['slow_lane']} 条）",
+        ]
+        # 有历史记录时显示调度前后的预计耗时
+        if stats["history_hits"]:
+            lines.append(
+                f"预计耗时：{stats['predicted_makespan_fifo']:.2f}s → "
+                f"{stats['predicted_makespan']:.2f}s"
+            )
+        # 各代理的吞吐量
+        for p in stats["proxies"]:
+            lines.append(
+                f"代理 {p['proxy']}：请求 {p['requests']}，失败 {p['failures']}，"
+                f"剔除 {p['ejections']} 次，吞吐 {p['throughput']:.1f} 次/秒，"
+                f"流量 {p['bytes_received'] / 1024:.1f} KB"
+            )
+        return "\n".join(lines)
+
+
+# 4. 规则检测（用测试关键词搜索，检查搜索规则能否提取书籍）
+class RuleCheckStep(Step):
+    name = "规则检测"
+    requires = ["rule_check"]
+
+    def run(self, context, config):
+        passed, failed, stats = check_rules_parallel(context.valid, config)
+        context.valid, context.rule_failed = passed, failed
+        context.stats["rule_check"] = stats
+        return (
+            f"规则检测完成，可用：{stats['ok']}，无结果：{stats['empty']}，"
+            f"请求失败：{stats['error']}，跳过：{stats['skipped']}"
+        )
 
 
-# 4. 域名去重（保留最快响应的书源）
+# 5. 域名去重（保留最快响应的书源）
 class DedupeStep(Step):
     name = "域名去重"
     requires = ["deduplicate_by_domain"]
@@ -98,10 +154,44 @@ class DedupeStep(Step):
         return f"域名去重完成，保留：{len(unique)}，重复：{len(duplicates)}"
 
 
-# 5. 保存结果（导出到文件夹）
+# 6. 保存结果（导出到文件夹）
 class SaveStep(Step):
     name = "保存结果"
 
     def run(self, context, config):
         save_sources_grouped(context, config)
         return f"全部处理完成，输出目录：{base_dir() / '导出'}"
+
+
+# ---- 分片步骤 ----
+
+
+# 筛选当前分片（按域名哈希拆分，同域名书源在同一分片）
+class ShardStep(Step):
+    name = "书源分片"
+
+    def run(self, context, config):
+        split_shard(context, config)
+        shard = config.shard
+        return f"当前分片 {shard.index}/{shard.count}，书源数量：{len(context.valid)}"
+
+
+# 保存分片结果（去重前的中间结果）
+class ShardSaveStep(Step):
+    name = "保存分片"
+
+    def run(self, context, config):
+        file_path = save_shard(pack_shard(context, config))
+        return f"分片结果已保存：{file_path}"
+
+
+# 合并分片结果（之后按单机流程去重并保存）
+class MergeShardsStep(Step):
+    name = "合并分片"
+
+    def run(self, context, config):
+        merge_shards(load_shards(), context)
+        return (
+            f"合并完成，有效：{len(context.valid)}，无效：{len(context.unreachable)}，"
+            f"规则失效：{len(context.rule_failed)}，其他：{len(context.invalid)}"
+        )
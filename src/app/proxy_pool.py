@@ -0,0 +1,143 @@
+import time
+import socket
+import threading
+import httpx
+from collections import deque
+
+# 默认端口：代理地址未写端口时使用
+default_ports = {"http": 80, "https": 443, "socks5": 1080, "socks5h": 1080}
+
+# 按失败率比较代理时使用的最近请求数
+window_size = 20
+
+
+# 单个代理：独立的连接池和健康状态
+class Proxy:
+    def __init__(self, url, client):
+        parsed = httpx.URL(url)
+        self.host = parsed.host
+        self.port = parsed.port or default_ports.get(parsed.scheme, 80)
+        self.label = f"{parsed.scheme}://{self.host}:{self.port}"  # 不显示账号密码
+        self.client = client
+        self.in_flight = 0  # 正在进行的请求数
+        self.requests = self.failures = self.bytes_received = 0
+        self.ejections = 0  # 被剔除次数
+        self.consecutive_failures = 0  # 连续无法连接代理的次数
+        self.outcomes = deque(maxlen=window_size)  # 最近请求是否失败
+        self.latency = None  # 响应时间的指数滑动平均（毫秒）
+        self.ejected_until = 0.0  # 剔除截止时间，之后重新加入
+        self.checked_at = 0.0  # 上次检查代理地址的时间
+        self.reachable = True  # 代理地址是否可以连接
+
+    def healthy(self, now):
+        return self.ejected_until <= now
+
+    def failure_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+
+# 代理池：按正在进行的请求数负载均衡，自动剔除异常或过慢的代理并在冷却后重新加入
+# 书源本身失效（超时、CONNECT 返回 502 等）不算代理的问题，只有以下情况会剔除：
+# 1. 代理地址本身无法连接
+# 2. 失败率或平均响应时间明显高于池中其他代理
+class ProxyPool:
+    def __init__(self, config, create_client, http2=False):
+        http = config.http
+        self.max_failures = http.proxy_max_failures
+        self.slow_ms = http.proxy_slow_ms
+        self.cooldown = http.proxy_cooldown
+        self.proxies = []
+        for url in http.proxies:
+            client = create_client(config, http2=http2, proxy=url)
+            self.proxies.append(Proxy(url, client))
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+
+    def __bool__(self):
+        return bool(self.proxies)
+
+    def close(self):
+        for proxy in self.proxies:
+            proxy.client.close()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            candidates = [p for p in self.proxies if p.healthy(now)]
+            # 全部被剔除 → 提前启用最快恢复的代理
+            if not candidates:
+                candidates = [min(self.proxies, key=lambda _: _.ejected_until)]
+            proxy = min(candidates, key=lambda _: _.in_flight)
+            proxy.in_flight += 1
+            return proxy
+
+    # 直接连接代理地址，判断连接失败是否来自代理本身（每秒最多检查一次）
+    def check_reachable(self, proxy):
+        now = time.monotonic()
+        if now - proxy.checked_at >= 1:
+            proxy.checked_at = now
+            try:
+                socket.create_connection((proxy.host, proxy.port), timeout=1).close()
+                proxy.reachable = True
+            except OSError:
+                proxy.reachable = False
+        return proxy.reachable
+
+    # 与池中其他代理比较：样本足够且明显更差时才判定异常
+    def worse_than_others(self, proxy, now):
+        others = [p for p in self.proxies if p is not proxy and p.healthy(now)]
+        # 失败率：至少一半失败，且是其他代理平均值的两倍以上
+        sampled = [p for p in others if len(p.outcomes) == window_size]
+        if len(proxy.outcomes) == window_size and sampled:
+            average = sum(p.failure_rate() for p in sampled) / len(sampled)
+            rate = proxy.failure_rate()
+            if rate >= 0.5 and rate >= average * 2:
+                return True
+        # 响应时间：超过慢代理阈值，且是其他代理平均值的两倍以上
+        timed = [p.latency for p in others if p.latency is not None]
+        if proxy.latency is not None and proxy.latency > self.slow_ms and timed:
+            return proxy.latency >= sum(timed) / len(timed) * 2
+        return False
+
+    # suspect：连接失败，可能是代理本身无法连接
+    def release(self, proxy, ok, respond_time=None, bytes_received=0, suspect=False):
+        proxy_down = suspect and not self.check_reachable(proxy)
+        with self.lock:
+            proxy.in_flight -= 1
+            proxy.requests += 1
+            proxy.bytes_received += bytes_received
+            proxy.outcomes.append(not ok)
+            if not ok:
+                proxy.failures += 1
+            if proxy_down:
+                proxy.consecutive_failures += 1
+            elif ok:
+                proxy.consecutive_failures = 0
+            if respond_time is not None:
+                if proxy.latency is None:
+                    proxy.latency = respond_time
+                else:
+                    proxy.latency = proxy.latency * 0.8 + respond_time * 0.2
+            # 代理连续无法连接，或明显差于其他代理 → 剔除，冷却后重新加入
+            now = time.monotonic()
+            down = proxy.consecutive_failures >= self.max_failures
+            if down or self.worse_than_others(proxy, now):
+                proxy.ejected_until = now + self.cooldown
+                proxy.ejections += 1
+                proxy.consecutive_failures = 0
+                proxy.outcomes.clear()
+                proxy.latency = None
+
+    def stats(self):
+        elapsed = max(time.perf_counter() - self.start_time, 1e-6)
+        return [
+            {
+                "proxy": p.label,
+                "requests": p.requests,
+                "failures": p.failures,
+                "ejections": p.ejections,
+                "bytes_received": p.bytes_received,
+                "throughput": p.requests / elapsed,  # 每秒请求数
+            }
+            for p in self.proxies
+        ]
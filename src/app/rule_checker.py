@@ -0,0 +1,153 @@
+import re
+import time
+import orjson
+from tqdm import tqdm
+from urllib.parse import quote, urljoin
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from selectolax.lexbor import SelectolaxError
+from url_checker import create_client, parse_html, read_body
+
+# 搜索地址模板：url,{请求参数}
+search_url_pattern = re.compile(r"^(.*?),\s*(\{.*\})\s*$", re.DOTALL)
+# 规则中的 JS 部分（不支持执行）
+js_pattern = re.compile(r"<js>|@js:", re.IGNORECASE)
+
+
+# 拆分 @css: 规则：返回 (选择器, 取值属性)，其他语法返回 None
+def split_css_rule(rule):
+    rule = js_pattern.split(rule or "", 1)[0].strip().lstrip("+-")
+    # 只取第一个备选规则，去掉正则替换部分
+    rule = rule.split("||", 1)[0].split("&&", 1)[0].split("##", 1)[0].strip()
+    if not rule.lower().startswith("@css:"):
+        return None
+    selector, sep, attr = rule[5:].rpartition("@")
+    if not sep:
+        return attr.strip(), ""
+    return selector.strip(), attr.strip()
+
+
+# 按规则从节点中取值
+def extract_value(node, selector, attr):
+    target = node.css_first(selector) if selector else node
+    if target is None:
+        return ""
+    if attr in ("", "text", "textNodes", "ownText"):
+        return target.text(strip=True)
+    if attr == "html":
+        return target.html or ""
+    return (target.attributes.get(attr) or "").strip()
+
+
+# 根据搜索地址模板构造请求：不支持的模板返回 None
+def build_search_request(source, keyword):
+    template = source.search_url.strip()
+    if not template or js_pattern.search(template):
+        return None
+    options = {}
+    if match := search_url_pattern.match(template):
+        template = match.group(1)
+        try:
+            options = orjson.loads(match.group(2))
+        except orjson.JSONDecodeError:
+            return None
+    charset = options.get("charset") or "utf-8"
+    try:
+        key = quote(keyword, encoding=charset)
+    except LookupError:
+        return None
+
+    def render(text):
+        return text.replace("{{key}}", key).replace("{{page}}", "1")
+
+    url, body = render(template), render(str(options.get("body") or ""))
+    # 还有其他模板表达式 → 不支持
+    if "{{" in url or "{{" in body:
+        return None
+    method = str(options.get("method") or "GET").upper()
+    return {
+        "method": method,
+        "url": urljoin(source.book_source_url, url),
+        "content": body.encode(charset) if method == "POST" else None,
+        "headers": (
+            {"Content-Type": "application/x-www-form-urlencoded"}
+            if method == "POST"
+            else None
+        ),
+    }
+
+
+# 检测单个书源的搜索规则：返回状态 ok / empty / skipped / error
+# error 表示搜索请求失败（可能只是临时问题），不代表规则失效
+def check_source_rule(source, config, client):
+    rule = source.rule_search
+    if rule is None:
+        return source, "skipped"
+    list_rule = split_css_rule(rule.book_list)
+    name_rule = split_css_rule(rule.name)
+    url_rule = split_css_rule(rule.book_url)
+    if list_rule is None or name_rule is None or url_rule is None:
+        return source, "skipped"
+    request = build_search_request(source, config.rules.keyword)
+    if request is None:
+        return source, "skipped"
+    try:
+        with client.stream(**request) as response:
+            if response.status_code != 200:
+                return source, "error"
+            content = read_body(response, config.rules.max_kb * 1024)
+    except Exception:
+        return source, "error"
+
+    # 解析耗时上限：lexbor 解析无法中断，单次解析的耗时由读取大小上限控制；
+    # 每个解析阶段之后检查时限，超时则不再继续解析，视为未完成检测
+    deadline = time.perf_counter() + config.rules.parse_timeout / 1000
+    try:
+        tree, _ = parse_html(content, deadline)
+        if time.perf_counter() > deadline:
+            return source, "skipped"
+        items = tree.css(list_rule[0])[: config.rules.max_items]
+        for item in items:
+            if time.perf_counter() > deadline:
+                return source, "skipped"
+            if extract_value(item, *name_rule) and extract_value(item, *url_rule):
+                return source, "ok"
+    except TimeoutError:
+        return source, "skipped"
+    except SelectolaxError:
+        # lexbor 不支持的选择器（如 Jsoup 的 :eq()、:contains()）→ 跳过
+        return source, "skipped"
+    except LookupError:
+        return source, "error"
+    return source, "empty"
+
+
+# 并发检测多个书源的搜索规则
+def check_rules_parallel(sources, config):
+    passed, failed = [], []
+    counts = {"ok": 0, "empty": 0, "skipped": 0, "error": 0}
+    start_time = time.perf_counter()
+    with (
+        create_client(config) as client,
+        tqdm(total=len(sources)) as progress_bar,
+        ThreadPoolExecutor(config.rules.max_workers) as executor,
+    ):
+        futures = [
+            executor.submit(check_source_rule, source, config, client)
+            for source in sources
+        ]
+        # 处理完成的任务：只有规则提取不到书籍的书源视为失效
+        for future in as_completed(futures):
+            source, status = future.result()
+            counts[status] += 1
+            if status == "empty":
+                failed.append(source)
+            else:
+                passed.append(source)
+            progress_bar.update(1)
+
+    # 保持原有顺序
+    order = {id(source): i for i, source in enumerate(sources)}
+    passed.sort(key=lambda _: order[id(_)])
+    failed.sort(key=lambda _: order[id(_)])
+    stats = {**counts, "elapsed": time.perf_counter() - start_time}
+    return passed, failed, stats
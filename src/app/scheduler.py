@@ -0,0 +1,124 @@
+import heapq
+import statistics
+import threading
+from collections import deque
+from models import HistoryEntry
+
+
+# 根据历史记录预测检测耗时（毫秒）：超时概率 × 总超时 + 其余按平均响应时间
+def predict_cost(entry, config):
+    timeout_ms = config.http.timeout * 1000
+    latency = entry.latency if entry.latency is not None else timeout_ms
+    return entry.timeout_rate * timeout_ms + (1 - entry.timeout_rate) * latency
+
+
+# 检测通道：每个通道的线程先处理本通道的书源，本通道取完后按顺序帮助其他通道
+class LaneQueue:
+    def __init__(self, lanes):
+        self.queues = [deque(sources) for sources in lanes]
+        self.lock = threading.Lock()
+
+    def take(self, lane):
+        with self.lock:
+            for queue in (self.queues[lane], *self.queues):
+                if queue:
+                    return queue.popleft()
+        return None
+
+
+# 模拟按 LaneQueue 规则分配给空闲线程时的总耗时（秒）
+# lanes 为 [(耗时列表, 线程数), ...]
+def simulate_makespan(lanes):
+    queues = [deque(costs) for costs, _ in lanes]
+    threads = [(0.0, i) for i, (_, count) in enumerate(lanes) for _ in range(count)]
+    heapq.heapify(threads)
+    finish = 0.0
+    while threads:
+        free_at, lane = heapq.heappop(threads)
+        queue = queues[lane] or next((q for q in queues if q), None)
+        if not queue:
+            continue  # 没有剩余书源，线程结束
+        free_at += queue.popleft()
+        finish = max(finish, free_at)
+        heapq.heappush(threads, (free_at, lane))
+    return finish / 1000
+
+
+# 安排检测顺序：返回 [(书源列表, 并发数), ...] 和调度统计
+def schedule_sources(sources, config, history):
+    http = config.http
+    workers = http.max_workers
+    known = {
+        s.book_source_url: predict_cost(history[s.book_source_url], config)
+        for s in sources
+        if s.book_source_url in history
+    }
+    stats = {
+        "schedule": "none",
+        "history_hits": len(known),
+        "predicted_makespan_fifo": 0.0,
+        "predicted_makespan": 0.0,
+        "slow_lane": 0,
+    }
+    # 没有历史记录 → 无法预测，按原顺序提交
+    if not known:
+        return [(sources, workers)], stats
+
+    # 没有历史记录的书源按已知书源的中位数估计
+    default = statistics.median(known.values())
+    costs = [known.get(s.book_source_url, default) for s in sources]
+    fifo = simulate_makespan([(costs, workers)])
+
+    policy = http.schedule
+    lanes = [(sources, workers)]
+    predicted = fifo
+    if policy != "none":
+        # 预计耗时长的书源优先提交（最长任务优先）
+        order = sorted(range(len(sources)), key=lambda i: -costs[i])
+        ordered = [sources[i] for i in order]
+        ordered_costs = [costs[i] for i in order]
+        lanes = [(ordered, workers)]
+        predicted = simulate_makespan([(ordered_costs, workers)])
+        policy = "slow_first"
+        # 慢速通道：预计超过慢速阈值的书源最多占用 慢速通道并发数上限 个线程，
+        # 其余线程先检测快速书源，避免被慢书源占满；任一通道取完后帮助另一个通道
+        slow_count = sum(c >= http.slow_threshold for c in ordered_costs)
+        slow_workers = min(http.slow_lane_workers, workers - 1, slow_count)
+        if http.schedule == "lane" and slow_workers > 0:
+            policy = "lane"
+            lanes = [
+                (ordered[:slow_count], slow_workers),
+                (ordered[slow_count:], workers - slow_workers),
+            ]
+            predicted = simulate_makespan(
+                [
+                    (ordered_costs[:slow_count], slow_workers),
+                    (ordered_costs[slow_count:], workers - slow_workers),
+                ]
+            )
+
+    stats["schedule"] = policy
+    stats["predicted_makespan_fifo"] = fifo
+    stats["predicted_makespan"] = predicted
+    stats["slow_lane"] = len(lanes[0][0]) if len(lanes) > 1 else 0
+    return lanes, stats
+
+
+# 用本次检测结果更新历史记录（指数滑动平均）
+def update_history(history, sources):
+    for source in sources:
+        entry = history.get(source.book_source_url)
+        timed_out = 1.0 if source.timed_out else 0.0
+        # 超时的检测只计入超时概率，不计入平均耗时
+        latency = None if source.timed_out else source.check_time
+        if entry is None:
+            history[source.book_source_url] = HistoryEntry(latency, timed_out, 1)
+            continue
+        entry.timeout_rate = entry.timeout_rate * 0.5 + timed_out * 0.5
+        if latency is not None:
+            if entry.latency is None:
+                entry.latency = latency
+            else:
+                entry.latency = entry.latency * 0.5 + latency * 0.5
+        entry.checks += 1
+    return history
@@ -0,0 +1,82 @@
+import hashlib
+from classifier import sort_key
+from models import ShardItem, ShardResult
+
+
+# 计算域名所属分片：使用稳定哈希，不同机器、不同进程结果一致
+def shard_of(domain, count):
+    digest = hashlib.blake2b(domain.encode(), digest_size=8).digest()
+    return int.from_bytes(digest) % count
+
+
+# 输入书源的摘要：与顺序无关，各分片加载同一批书源时结果相同
+def sources_digest(sources):
+    digest = hashlib.blake2b(digest_size=8)
+    for url in sorted(s.book_source_url for s in sources):
+        digest.update(url.encode() + b"\n")
+    return digest.hexdigest()
+
+
+# 只保留当前分片的书源：同域名书源总在同一分片，无域名书源归入 0 号分片
+def split_shard(context, config):
+    count, index = config.shard.count, config.shard.index
+    if not 0 <= index < count:
+        raise ValueError(f"分片序号 {index} 超出范围 0-{count - 1}")
+    # 记录书源总数和摘要，合并时检查分片是否齐全、是否来自同一批书源
+    sources = context.valid + context.invalid
+    context.stats["shard"] = {"total": len(sources), "digest": sources_digest(sources)}
+    context.valid = [s for s in context.valid if shard_of(s.domain, count) == index]
+    if index != 0:
+        context.invalid = []
+
+
+# 打包当前分片的结果
+def pack_shard(context, config):
+    def pack(sources):
+        return [ShardItem(s, s.domain, s.primary_category) for s in sources]
+
+    return ShardResult(
+        index=config.shard.index,
+        count=config.shard.count,
+        total=context.stats["shard"]["total"],
+        digest=context.stats["shard"]["digest"],
+        valid=pack(context.valid),
+        invalid=pack(context.invalid),
+        unreachable=pack(context.unreachable),
+        rule_failed=pack(context.rule_failed),
+    )
+
+
+# 合并各分片结果：检查分片是否齐全，按单机运行的顺序重新排序
+def merge_shards(results, context):
+    if not results:
+        raise ValueError("没有找到分片结果")
+    first = results[0]
+    if any(r.digest != first.digest or r.total != first.total for r in results):
+        raise ValueError("分片结果来自不同批次的书源，请清空分片目录后重新检测")
+    count = first.count
+    indexes = sorted(r.index for r in results)
+    if any(r.count != count for r in results) or indexes != list(range(count)):
+        raise ValueError(f"分片结果不完整或重复：{indexes}，分片总数 {count}")
+    # 每个书源都应出现在某个分片的结果中
+    merged = sum(
+        len(r.valid) + len(r.invalid) + len(r.unreachable) + len(r.rule_failed)
+        for r in results
+    )
+    if merged != first.total:
+        raise ValueError(f"分片结果不完整：共 {merged} 条书源，应为 {first.total} 条")
+
+    def unpack(name):
+        sources = []
+        for result in results:
+            for item in getattr(result, name):
+                item.source.domain = item.domain
+                item.source.primary_category = item.primary_category
+                sources.append(item.source)
+        sources.sort(key=sort_key)
+        return sources
+
+    context.valid = unpack("valid")
+    context.invalid = unpack("invalid")
+    context.unreachable = unpack("unreachable")
+    context.rule_failed = unpack("rule_failed")
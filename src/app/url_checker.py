@@ -1,27 +1,36 @@
 import re
 import time
+import socket
+import codecs
+import threading
 import httpx
+import msgspec
+import orjson
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from selectolax.lexbor import LexborHTMLParser
+from classifier import sort_key
+from proxy_pool import ProxyPool
+from queue import Queue
+from scheduler import LaneQueue, schedule_sources
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
 base64_pattern = re.compile(r"[A-Za-z0-9+/]{20,}={0,2}")
-title_pattern = re.compile(r"<title>(.*?)</title>", re.IGNORECASE | re.DOTALL)
-encoding_pattern = re.compile(
-    r'<meta[^>]*?(?:charset|http-equiv.*?charset)=["\']?([^"\'\s;>]+)["\']?',
-    re.IGNORECASE,
-)
 
 
-def validate_response(response, text, config):
-    if response.status_code != 200:
+def validate_response(response, body, text, config, truncated=False):
+    # range 模式下服务器返回 206 部分内容
+    if response.status_code not in (200, 206):
         return False
     # JSON 响应
     content_type = response.headers.get("Content-Type", "").lower()
     if "application/json" in content_type or "text/json" in content_type:
+        # 分段读取时 JSON 不完整，只检查开头
+        if truncated:
+            return body.lstrip()[:1] in (b"{", b"[")
         try:
-            data = response.json()
+            data = orjson.loads(body)
             return isinstance(data, (dict, list)) and bool(data)
-        except (ValueError, TypeError):
+        except orjson.JSONDecodeError:
             return False
     # 1. 必须包含 <html> 标签
     if "<html" not in text:
@@ -41,62 +50,364 @@ def validate_response(response, text, config):
     return True
 
 
+# 瞬时错误：握手超时、连接重置等，重试可能成功
+transient_errors = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.ReadTimeout,
+    httpx.ReadError,
+    httpx.RemoteProtocolError,
+    httpx.PoolTimeout,
+    httpx.ProxyError,
+)
+
+
+# 域名解析失败：失效书源的域名大多已不存在，重试不会成功，不消耗重试预算
+def is_dns_error(error):
+    while error is not None:
+        if isinstance(error, socket.gaierror):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+# 单次探测结果（多次尝试并发时互不干扰，最后再写回书源）
+class ProbeResult(msgspec.Struct):
+    valid: bool = False
+    respond_time: int | None = None
+    name: str = ""
+    bytes_received: int = 0
+
+
+# 创建 HTTP 客户端
+def create_client(config, http2=False, proxy=None):
+    return httpx.Client(
+        http2=http2,
+        proxy=proxy,
+        follow_redirects=True,
+        verify=config.http.verify,
+        trust_env=config.http.trust_env,
+        max_redirects=config.http.max_redirects,
+        headers={"User-Agent": config.http.user_agent},
+        timeout=httpx.Timeout(config.http.timeout, read=config.http.timeout_read),
+        limits=httpx.Limits(max_connections=config.http.max_workers),
+    )
+
+
+# 探测会话：共享客户端、重试预算和对冲请求的延迟统计
+class ProbeSession:
+    def __init__(self, config, total):
+        http = config.http
+        # 启用 HTTP/2 时共用一个客户端，同域名书源复用同一条多路复用连接
+        self.http2 = http.http2
+        self.client = create_client(config, http2=True) if self.http2 else None
+        # 代理池：每个代理独立的连接池，请求分散到各个出口
+        self.pool = None
+        if http.proxies:
+            self.pool = ProxyPool(config, create_client, self.http2) or None
+        # 对冲请求在独立线程池中执行，首次请求和对冲请求各占一半
+        self.executor = None
+        if http.hedge:
+            self.executor = ThreadPoolExecutor(http.max_workers * 2)
+        # 全局预算：重试和对冲总次数不超过书源数量的一定比例
+        self.retry_budget = int(total * http.retry_budget)
+        self.hedge_budget = int(total * http.hedge_budget)
+        self.hedge_percentile = http.hedge_percentile
+        self.retries = self.hedges = self.hedge_wins = 0
+        self.bytes_received = 0  # 所有尝试的传输字节数（含失败和落后的请求）
+        self.latencies = []  # 本次运行已完成请求的响应时间（毫秒）
+        self.hedge_delay_ms = None  # 缓存的对冲延迟阈值
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if self.client is not None:
+            self.client.close()
+        if self.pool is not None:
+            self.pool.close()
+        if self.executor is not None:
+            # 落后的请求结果已被丢弃，不再等待
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # 执行一次探测：无论成功与否，都计入本次尝试的传输字节数
+    def attempt(self, source, config):
+        result = ProbeResult()
+        try:
+            return self.probe(source, config, result)
+        finally:
+            with self.lock:
+                self.bytes_received += result.bytes_received
+
+    # 启用代理池时从池中选择代理，并记录代理的健康状态
+    def probe(self, source, config, result):
+        if self.pool is None:
+            return probe_once(source, config, self.client, result)
+        proxy = self.pool.acquire()
+        try:
+            probe_once(source, config, proxy.client, result)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            # 经过代理时只会直接连接代理，连接失败可能来自代理本身
+            self.pool.release(proxy, False, None, result.bytes_received, suspect=True)
+            raise
+        except transient_errors:
+            # 书源超时、CONNECT 返回 502 等，不直接算作代理的问题
+            self.pool.release(proxy, False, None, result.bytes_received)
+            raise
+        except Exception:
+            # 非网络错误与代理无关，不计入失败
+            self.pool.release(proxy, True, None, result.bytes_received)
+            raise
+        self.pool.release(proxy, True, result.respond_time, result.bytes_received)
+        return result
+
+    def record(self, respond_time):
+        with self.lock:
+            self.latencies.append(respond_time)
+            count = len(self.latencies)
+            # 样本足够后每 16 个样本重新计算一次百分位，避免频繁排序
+            if count >= 20 and (count - 20) % 16 == 0:
+                ordered = sorted(self.latencies)
+                index = min(count - 1, int(count * self.hedge_percentile / 100))
+                self.hedge_delay_ms = ordered[index]
+
+    def take_retry(self):
+        with self.lock:
+            if self.retries >= self.retry_budget:
+                return False
+            self.retries += 1
+            return True
+
+    def take_hedge(self):
+        with self.lock:
+            if self.hedges >= self.hedge_budget:
+                return False
+            self.hedges += 1
+            return True
+
+    def hedge_delay(self):
+        # 未启用对冲、样本不足或预算耗尽 → 不对冲
+        if self.executor is None or self.hedge_delay_ms is None:
+            return None
+        if self.hedges >= self.hedge_budget:
+            return None
+        return self.hedge_delay_ms / 1000
+
+    def stats(self):
+        return {
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_ms": self.hedge_delay_ms,
+            "bytes_received": self.bytes_received,
+            "proxies": self.pool.stats() if self.pool is not None else [],
+        }
+
+
+# 统计响应传输的字节数（响应头 + 响应体，包含重定向）
+def response_size(response):
+    size = 0
+    for item in [*response.history, response]:
+        size += sum(len(k) + len(v) + 4 for k, v in item.headers.raw)
+        size += item.num_bytes_downloaded
+    return size
+
+
+# 读取响应体，达到上限后停止读取
+def read_body(response, limit=None):
+    chunks, size = [], 0
+    for chunk in response.iter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if limit and size >= limit:
+            break
+    return b"".join(chunks)
+
+
+# 从 <meta> 标签中获取网页编码
+def find_charset(tree):
+    for meta in tree.css("meta"):
+        attrs = meta.attributes
+        if charset := attrs.get("charset"):
+            return charset.strip()
+        content = (attrs.get("content") or "").lower()
+        if "charset=" in content:
+            return content.split("charset=", 1)[1].split(";")[0].strip()
+    return None
+
+
+# 解析网页：按 <meta> 编码解码，返回文档树和文本
+def parse_html(content, deadline=None):
+    # 先按 UTF-8 解析，非 UTF-8 网页解码后重新解析
+    tree = LexborHTMLParser(content)
+    encoding = find_charset(tree) or "utf-8"  # 默认编码
+    text = content.decode(encoding, errors="replace")
+    if codecs.lookup(encoding).name != "utf-8":
+        # 超过解析时限 → 不再重新解析
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeoutError("解析超时")
+        tree = LexborHTMLParser(text)
+    return tree, text
+
+
+# 单次探测：出错时抛出异常，由调用方决定是否重试；已传输的字节数写入 result
+def probe_once(source, config, client=None, result=None):
+    if client is None:
+        with create_client(config) as client:
+            return probe_once(source, config, client, result)
+    start_time = time.perf_counter()
+    result = result if result is not None else ProbeResult()
+    mode = config.http.probe_mode
+    if mode == "head":
+        # HEAD 探测：只判断存活
+        response = client.head(source.book_source_url)
+        result.bytes_received += response_size(response)
+        if response.is_success:
+            result.respond_time = int((time.perf_counter() - start_time) * 1000)
+            result.valid = response.status_code == 200
+            return result
+        # 很多服务器和 CDN 对 HEAD 返回 403、404 等，但 GET 正常 → 回退到完整 GET
+    headers, limit = None, None
+    if mode == "range":
+        limit = config.http.range_kb * 1024
+        headers = {"Range": f"bytes=0-{limit - 1}"}
+    with client.stream("GET", source.book_source_url, headers=headers) as response:
+        try:
+            body = read_body(response, limit)
+        finally:
+            # 读取中途出错时也统计已传输的字节数
+            result.bytes_received += response_size(response)
+        # 计算响应时间
+        result.respond_time = int((time.perf_counter() - start_time) * 1000)
+
+        # 解析内容，限制大小以提高性能
+        content = body[:100_000]  # 限制为100KB
+        tree, text = parse_html(content)
+        if title := tree.css_first("title"):
+            result.name = title.text(strip=True)
+        text = text.lower()
+        truncated = limit is not None and len(body) >= limit
+        result.valid = validate_response(response, body, text, config, truncated)
+        return result
+
+
+# 对冲探测：首次请求超过本次运行的延迟百分位仍未返回时，再发一次请求，取先返回者
+def probe_hedged(source, config, session):
+    delay = session.hedge_delay()
+    if delay is None:
+        return session.attempt(source, config)
+    primary = session.executor.submit(session.attempt, source, config)
+    done, _ = wait([primary], timeout=delay)
+    if done or not session.take_hedge():
+        return primary.result()
+    hedge = session.executor.submit(session.attempt, source, config)
+    error = None
+    for future in as_completed([primary, hedge]):
+        try:
+            result = future.result()
+        except Exception as e:
+            error = error or e
+            continue
+        if future is hedge:
+            with session.lock:
+                session.hedge_wins += 1
+        return result
+    raise error
+
+
 # 检测单个书源 URL 是否有效
-def check_source_url(source, config):
+def check_source_url(source, config, session=None):
     start_time = time.perf_counter()
-    try:
-        with httpx.Client(
-            follow_redirects=True,
-            verify=config.http.verify,
-            trust_env=config.http.trust_env,
-            max_redirects=config.http.max_redirects,
-            headers={"User-Agent": config.http.user_agent},
-            timeout=httpx.Timeout(config.http.timeout, read=config.http.timeout_read),
-        ) as client:
-            response = client.get(source.book_source_url)
-            # 计算响应时间
-            delay_ms = int((time.perf_counter() - start_time) * 1000)
-            source.respond_time = delay_ms
-
-            # 读取并解码内容，限制大小以提高性能
-            content = response.content[:100_000]  # 限制为100KB
-            encoding = "utf-8"  # 默认编码
-            html_snippet = content[:2000].decode(encoding, errors="replace")
-            if meta_match := encoding_pattern.search(html_snippet):
-                encoding = meta_match.group(1).strip()
-            text = content.decode(encoding, errors="replace").lower()
-            if title_match := title_pattern.search(text):
-                source.book_source_name = title_match.group(1).strip()
-            return source, validate_response(response, text, config)
-    except Exception:
-        return source, False
+    source.timed_out = False
+    attempts = 0
+    while True:
+        try:
+            if session is None:
+                result = probe_once(source, config)
+            else:
+                result = probe_hedged(source, config, session)
+            break
+        except transient_errors as e:
+            # 瞬时错误 → 在重试次数和全局预算内重试（域名不存在不重试）
+            retry = session is not None and attempts < config.http.retry_count
+            retry = retry and not is_dns_error(e)
+            if retry and session.take_retry():
+                attempts += 1
+                continue
+            source.timed_out = isinstance(e, httpx.TimeoutException)
+            source.check_time = int((time.perf_counter() - start_time) * 1000)
+            return source, False
+        except Exception:
+            source.check_time = int((time.perf_counter() - start_time) * 1000)
+            return source, False
+    source.check_time = int((time.perf_counter() - start_time) * 1000)
+    if session is not None:
+        session.record(result.respond_time)
+    source.respond_time = result.respond_time
+    source.bytes_received = result.bytes_received
+    if result.name:
+        source.book_source_name = result.name
+    return source, result.valid
 
 
 # 并发检测多个 URL
-def check_urls_parallel(sources, config):
+def check_urls_parallel(sources, config, history=None):
     reachable, unreachable = [], []
-    with tqdm(total=len(sources)) as progress_bar:
-        with ThreadPoolExecutor(config.http.max_workers) as executor:
-            future_to_source = {
-                executor.submit(check_source_url, source, config): source
-                for source in sources
-            }
-            # 处理完成的任务
-            for future in as_completed(future_to_source):
-                source, valid = future.result()
-                if valid:
-                    reachable.append(source)
-                else:
-                    unreachable.append(source)
-                progress_bar.update(1)
+    # 按历史记录安排提交顺序，慢的书源先提交或使用独立通道
+    lanes, schedule_stats = schedule_sources(sources, config, history or {})
+    lane_queue = LaneQueue([lane_sources for lane_sources, _ in lanes])
+    results = Queue()
 
-    # 排序 - 优先按名称排序，名称为空时按URL排序
-    def sort_key(item):
-        return (item.book_source_name.lower(), item.respond_time)
+    # 检测线程：按顺序从通道中取出书源，异常交给主线程抛出
+    def worker(lane, session):
+        try:
+            while (source := lane_queue.take(lane)) is not None:
+                results.put(check_source_url(source, config, session))
+        except Exception as e:
+            results.put(e)
 
+    start_time = time.perf_counter()
+    with (
+        ProbeSession(config, len(sources)) as session,
+        tqdm(total=len(sources)) as progress_bar,
+        ThreadPoolExecutor(config.http.max_workers) as executor,
+    ):
+        for lane, (_, workers) in enumerate(lanes):
+            for _ in range(workers):
+                executor.submit(worker, lane, session)
+        # 处理完成的任务
+        for _ in range(len(sources)):
+            item = results.get()
+            if isinstance(item, Exception):
+                raise item
+            source, valid = item
+            if valid:
+                reachable.append(source)
+            else:
+                unreachable.append(source)
+            progress_bar.update(1)
+    makespan = time.perf_counter() - start_time
+
+    # 排序 - 优先按名称排序，名称为空时按URL排序
     reachable.sort(key=sort_key)
     unreachable.sort(key=sort_key)
-    return reachable, unreachable
+    # 统计信息：探测模式、协议和传输字节数，便于比较不同模式的带宽和延迟
+    # bytes_received 为所有尝试的流量，
+    # bytes_unused 为未采用的尝试（失败后重试、落后的对冲请求等）的流量
+    times = [s.respond_time for s in reachable if s.respond_time is not None]
+    session_stats = session.stats()
+    used = sum(s.bytes_received for s in sources)
+    stats = {
+        "probe_mode": config.http.probe_mode,
+        "http2": session.http2,
+        "bytes_unused": session_stats["bytes_received"] - used,
+        "avg_respond_time": sum(times) // len(times) if times else 0,
+        "makespan": makespan,
+        **schedule_stats,
+        **session_stats,
+    }
+    return reachable, unreachable, stats
 
 
 # 域名去重：保留最快响应的书源
@@ -0,0 +1,159 @@
+import time
+import select
+import socket
+import struct
+import threading
+import urllib.request
+import pytest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from configs import AppConfig
+from models import BookSource
+
+
+# 测试用网页：/json 返回 JSON，/search 返回搜索结果，/missing 返回 404，其余返回小说网页
+# /reset 总是重置连接，/flaky 第一次请求重置连接，/slow 第一次请求延迟 0.5 秒
+class PageHandler(BaseHTTPRequestHandler):
+    hits = {}  # 各路径的请求次数
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def reset(self):
+        # SO_LINGER 为 0 时关闭连接会发送 RST
+        linger = struct.pack("ii", 1, 0)
+        self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, linger)
+        self.close_connection = True
+
+    def do_HEAD(self):
+        # /nohead 模拟不支持 HEAD 的服务器，/headblocked 模拟拒绝 HEAD 的 CDN
+        if self.path.startswith("/nohead"):
+            self.send_error(405)
+            return
+        if self.path.startswith("/headblocked"):
+            self.send_error(403)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.end_headers()
+
+    def do_GET(self):
+        with self.lock:
+            hits = self.hits[self.path] = self.hits.get(self.path, 0) + 1
+        if self.path.startswith("/reset") or (
+            self.path.startswith("/flaky") and hits == 1
+        ):
+            self.reset()
+            return
+        if self.path.startswith("/slow") and hits == 1:
+            time.sleep(0.5)
+        if self.path.startswith("/missing"):
+            self.send_error(404)
+            return
+        if self.path.startswith("/search"):
+            body = '<ul class="list"><li><a class="t" href="/b/1">书名</a></li></ul>'
+            body, content_type = body.encode(), "text/html; charset=utf-8"
+        elif self.path.startswith("/json"):
+            body, content_type = b'{"books": [1, 2]}', "application/json"
+        else:
+            body = "<html><head><title>小说站</title></head><body>章节</body></html>"
+            body, content_type = body.encode(), "text/html; charset=utf-8"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# 本地代理：转发 GET 请求，CONNECT 目标无法连接时返回 502
+class ProxyHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with urllib.request.urlopen(self.path) as response:
+            body = response.read()
+            self.send_response(response.status)
+            self.send_header("Content-Type", response.headers["Content-Type"])
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def do_CONNECT(self):
+        host, _, port = self.path.rpartition(":")
+        try:
+            upstream = socket.create_connection((host, int(port)), timeout=1)
+        except OSError:
+            self.send_error(502)
+            return
+        self.send_response(200)
+        self.end_headers()
+        sockets = [self.connection, upstream]
+        while True:
+            readable, _, _ = select.select(sockets, [], [], 5)
+            if not readable:
+                break
+            for sock in readable:
+                data = sock.recv(65536)
+                if not data:
+                    upstream.close()
+                    return
+                (upstream if sock is self.connection else self.connection).sendall(data)
+        upstream.close()
+
+
+def serve(handler):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def page_server():
+    PageHandler.hits.clear()
+    server = serve(PageHandler)
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.fixture
+def proxy_server():
+    servers = []
+
+    def start():
+        server = serve(ProxyHandler)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+# 没有监听的本地端口
+@pytest.fixture
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def config():
+    config = AppConfig()
+    config.http.trust_env = False
+    config.http.hedge = False
+    return config
+
+
+def make_source(url, **kwargs):
+    return BookSource(
+        book_source_url=url,
+        book_source_name="测试",
+        book_source_type=0,
+        enabled=True,
+        enabled_explore=True,
+        weight=0,
+        custom_order=0,
+        **kwargs,
+    )
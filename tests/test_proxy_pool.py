@@ -0,0 +1,58 @@
+import time
+import httpx
+from conftest import make_source
+from url_checker import ProbeSession, check_urls_parallel
+
+
+# HTTP 和 SOCKS 代理都加入代理池
+def test_socks_proxy_added(config, closed_port):
+    config.http.proxies = [
+        f"http://127.0.0.1:{closed_port}",
+        f"socks5://127.0.0.1:{closed_port}",
+    ]
+    with ProbeSession(config, 1) as session:
+        labels = [proxy.label for proxy in session.pool.proxies]
+    assert labels == config.http.proxies
+
+
+# 书源失效（CONNECT 返回 502）不应剔除正常的代理
+def test_dead_targets_do_not_eject_proxy(config, proxy_server, closed_port):
+    config.http.proxies = [proxy_server(), proxy_server()]
+    sources = [make_source(f"https://127.0.0.1:{closed_port}/{i}") for i in range(60)]
+    reachable, unreachable, stats = check_urls_parallel(sources, config)
+    assert not reachable and len(unreachable) == 60
+    for proxy in stats["proxies"]:
+        assert proxy["requests"] > 0
+        assert proxy["failures"] == proxy["requests"]
+        assert proxy["ejections"] == 0
+
+
+# 无法连接的代理被剔除，冷却后重新加入
+def test_unreachable_proxy_ejected_and_readmitted(
+    config, proxy_server, page_server, closed_port
+):
+    config.http.proxies = [f"http://127.0.0.1:{closed_port}", proxy_server()]
+    config.http.proxy_max_failures = 2
+    config.http.proxy_cooldown = 0.5
+    source = make_source(f"{page_server}/book")
+    with ProbeSession(config, 10) as session:
+        dead, good = session.pool.proxies
+        for _ in range(2):
+            try:
+                session.attempt(source, config)
+            except httpx.ConnectError:
+                pass
+        assert dead.ejections == 1
+        assert not dead.healthy(time.monotonic())
+
+        # 剔除期间请求都经过正常的代理
+        for _ in range(3):
+            assert session.attempt(source, config).valid
+        assert good.requests == 3 and good.ejections == 0
+
+        # 冷却后重新加入：两个代理都空闲时优先选择排在前面的代理
+        time.sleep(0.6)
+        assert dead.healthy(time.monotonic())
+        proxy = session.pool.acquire()
+        session.pool.release(proxy, ok=True)
+        assert proxy is dead
@@ -0,0 +1,43 @@
+from conftest import make_source
+from models import RuleSearch
+from rule_checker import check_rules_parallel, split_css_rule
+
+
+def make_rule_source(base_url, search_url, book_list, name="@css:a.t@text"):
+    rule = RuleSearch(book_list=book_list, name=name, book_url="@css:a.t@href")
+    return make_source(base_url, search_url=search_url, rule_search=rule)
+
+
+def test_split_css_rule():
+    assert split_css_rule("@css:.list li") == (".list li", "")
+    assert split_css_rule("@CSS:a.t@href##\\s+") == ("a.t", "href")
+    assert split_css_rule("class.list@tag.li") is None
+    assert split_css_rule("@css:a@text<js>result</js>") == ("a", "text")
+
+
+# 各种结果：只有提取不到书籍的书源视为规则失效，不支持的选择器不会中断检测
+def test_check_rules_statuses(config, page_server):
+    config.rules.max_workers = 4
+    ok = make_rule_source(page_server, "/search?q={{key}}", "@css:.list li")
+    empty = make_rule_source(page_server, "/search?q={{key}}", "@css:.none li")
+    jsoup = make_rule_source(page_server, "/search?q={{key}}", "@css:.list li:eq(0)")
+    blank = make_rule_source(page_server, "/search?q={{key}}", "@css:")
+    error = make_rule_source(page_server, "/missing?q={{key}}", "@css:.list li")
+    js = make_rule_source(page_server, "@js:'/search'", "@css:.list li")
+    sources = [ok, empty, jsoup, blank, error, js]
+
+    passed, failed, stats = check_rules_parallel(sources, config)
+
+    assert failed == [empty]
+    assert passed == [ok, jsoup, blank, error, js]
+    counts = (stats["ok"], stats["empty"], stats["error"], stats["skipped"])
+    assert counts == (1, 1, 1, 3)
+
+
+# 超过解析时限的书源跳过，不判定为失效
+def test_parse_timeout_skips(config, page_server):
+    config.rules.parse_timeout = 0
+    source = make_rule_source(page_server, "/search?q={{key}}", "@css:.list li")
+    passed, failed, stats = check_rules_parallel([source], config)
+    assert passed == [source] and not failed
+    assert stats["skipped"] == 1
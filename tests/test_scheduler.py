@@ -0,0 +1,67 @@
+import random
+from conftest import make_source
+from models import HistoryEntry
+from scheduler import LaneQueue, schedule_sources, simulate_makespan
+from url_checker import check_urls_parallel
+
+
+def make_history(sources, latencies):
+    return {
+        s.book_source_url: HistoryEntry(latency, 0.0, 1)
+        for s, latency in zip(sources, latencies)
+    }
+
+
+# 本通道取完后帮助其他通道：快速通道帮助慢速通道，慢速通道也帮助快速通道
+def test_lane_queue_helps_other_lanes():
+    queue = LaneQueue([["slow1", "slow2"], ["fast1", "fast2"]])
+    assert queue.take(1) == "fast1"
+    assert queue.take(0) == "slow1"
+    assert queue.take(0) == "slow2"
+    assert queue.take(0) == "fast2"
+    assert queue.take(1) is None
+
+
+def test_simulate_makespan_idle_threads_help_other_lanes():
+    assert simulate_makespan([([1000] * 4, 1), ([], 3)]) == 1.0
+    assert simulate_makespan([([], 3), ([1000] * 4, 1)]) == 1.0
+    assert simulate_makespan([([1000] * 4, 4)]) == 1.0
+
+
+# 全部书源都超过慢速阈值时，快速通道的线程直接帮助慢速通道
+def test_lane_uses_all_threads_when_every_source_is_slow(config):
+    random.seed(0)
+    config.http.max_workers = 128
+    config.http.schedule = "lane"
+    sources = [make_source(f"https://s{i}.com") for i in range(2000)]
+    latencies = [random.uniform(600, 3000) for _ in sources]
+    lanes, stats = schedule_sources(sources, config, make_history(sources, latencies))
+    assert sum(workers for _, workers in lanes) == 128
+    assert stats["schedule"] == "lane"
+    assert stats["slow_lane"] == 2000
+
+    config.http.schedule = "slow_first"
+    _, slow_first = schedule_sources(sources, config, make_history(sources, latencies))
+    assert stats["predicted_makespan"] == slow_first["predicted_makespan"]
+
+
+# 选择 lane 时不会被预计耗时改回 slow_first：少量慢书源使用慢速通道，快速书源不被阻塞
+def test_lane_schedule_checks_every_source(config, page_server):
+    config.http.max_workers = 8
+    config.http.schedule = "lane"
+    sources = [make_source(f"{page_server}/book{i}") for i in range(40)]
+    latencies = [2000 if i % 10 == 0 else 50 for i in range(40)]
+    history = make_history(sources, latencies)
+    lanes, _ = schedule_sources(sources, config, history)
+    assert [len(lane) for lane, _ in lanes] == [4, 36]
+    assert [workers for _, workers in lanes] == [4, 4]
+
+    reachable, unreachable, stats = check_urls_parallel(sources, config, history)
+    assert len(reachable) + len(unreachable) == 40
+    assert stats["schedule"] == "lane"
+    assert stats["slow_lane"] == 4
+    assert stats["history_hits"] == 40
+
+    config.http.schedule = "slow_first"
+    _, slow_first = schedule_sources(sources, config, history)
+    assert stats["predicted_makespan"] <= slow_first["predicted_makespan"]
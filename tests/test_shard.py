@@ -0,0 +1,118 @@
+import zlib
+import random
+from types import SimpleNamespace
+import msgspec
+import pytest
+from classifier import classify_and_sort_sources, sort_key
+from conftest import make_source
+from models import BookSource, ShardResult
+from shard import merge_shards, pack_shard, split_shard
+from url_checker import deduplicate_by_domain
+
+lists = ["valid", "invalid", "unreachable", "rule_failed", "duplicates"]
+
+
+# 合成书源：部分书源同域名（不同子域名），另有无域名书源
+def make_sources():
+    random.seed(0)
+    sources = []
+    for i in range(300):
+        prefix = random.choice(["", "www.", "m."])
+        site = random.randrange(120)
+        source = make_source(f"https://{prefix}site{site}.com/{i}")
+        source.book_source_name = random.choice(["", "书城", "小说站", "Book"])
+        source.book_source_group = random.choice(["", "男频", "女频", "精品"])
+        sources.append(source)
+    sources += [make_source(f"http://127.0.0.1/{i}") for i in range(5)]
+    return msgspec.json.encode(sources)
+
+
+# 模拟 URL 检测和规则检测：结果只取决于书源本身，排序与 check_urls_parallel 一致
+def fake_check(context):
+    reachable, unreachable = [], []
+    for source in context.valid:
+        source.respond_time = zlib.crc32(source.book_source_url.encode()) % 500
+        (unreachable if source.respond_time % 5 == 0 else reachable).append(source)
+    reachable.sort(key=sort_key)
+    unreachable.sort(key=sort_key)
+    context.valid = [s for s in reachable if s.respond_time % 7]
+    context.rule_failed = [s for s in reachable if not s.respond_time % 7]
+    context.unreachable = unreachable
+
+
+# 流水线上下文（pipeline 依赖 Windows 的 msvcrt，这里只保留用到的字段）
+def new_context():
+    return SimpleNamespace(
+        valid=[], invalid=[], unreachable=[], rule_failed=[], duplicates=[], stats={}
+    )
+
+
+def load(data, config):
+    context = new_context()
+    sources = msgspec.json.decode(data, type=list[BookSource])
+    _, context.valid, context.invalid = classify_and_sort_sources(sources, config)
+    return context
+
+
+def dump(context):
+    return {
+        name: (
+            msgspec.json.encode(getattr(context, name)),
+            [(s.domain, s.primary_category) for s in getattr(context, name)],
+        )
+        for name in lists
+    }
+
+
+# 按分片检测，结果经过文件格式往返
+def run_shards(data, config, count):
+    results = []
+    config.shard.count = count
+    for index in range(count):
+        config.shard.index = index
+        context = load(data, config)
+        split_shard(context, config)
+        fake_check(context)
+        encoded = msgspec.json.encode(pack_shard(context, config))
+        results.append(msgspec.json.decode(encoded, type=ShardResult))
+    return results
+
+
+def merge(results, config):
+    context = new_context()
+    merge_shards(results, context)
+    context.valid, context.duplicates = deduplicate_by_domain(context.valid, config)
+    return context
+
+
+# 合并后去重的结果与单机运行一致
+@pytest.mark.parametrize("count", [1, 2, 4, 7])
+def test_merged_shards_match_single_node(config, count):
+    data = make_sources()
+    single = load(data, config)
+    fake_check(single)
+    single.valid, single.duplicates = deduplicate_by_domain(single.valid, config)
+
+    results = run_shards(data, config, count)
+    merged = merge(list(reversed(results)), config)  # 与文件读取顺序无关
+
+    assert single.duplicates and single.rule_failed and single.unreachable
+    assert dump(merged) == dump(single)
+
+
+# 分片缺失、重复、来自不同批次或条目不全时拒绝合并
+def test_incomplete_shards_rejected(config):
+    data = make_sources()
+    results = run_shards(data, config, 4)
+    with pytest.raises(ValueError):
+        merge(results[:3], config)
+    with pytest.raises(ValueError):
+        merge([*results[:3], results[2]], config)
+
+    other = run_shards(msgspec.json.encode([make_source("https://x.com/")]), config, 4)
+    with pytest.raises(ValueError):
+        merge([*results[:3], other[3]], config)
+
+    results[1].valid.pop()
+    with pytest.raises(ValueError):
+        merge(results, config)
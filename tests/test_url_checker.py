@@ -0,0 +1,87 @@
+import pytest
+from conftest import make_source
+from url_checker import ProbeSession, check_source_url
+
+
+# JSON 书源：流式读取后仍能校验 JSON 内容
+@pytest.mark.parametrize("mode", ["get", "range"])
+def test_json_source_is_valid(config, page_server, mode):
+    config.http.probe_mode = mode
+    source, valid = check_source_url(make_source(f"{page_server}/json"), config)
+    assert valid
+
+
+@pytest.mark.parametrize("mode", ["get", "head", "range"])
+def test_probe_modes(config, page_server, mode):
+    config.http.probe_mode = mode
+    source, valid = check_source_url(make_source(f"{page_server}/book"), config)
+    assert valid
+    assert source.bytes_received > 0
+    # HEAD 不读取网页内容，不会更新名称
+    assert source.book_source_name == ("测试" if mode == "head" else "小说站")
+
+
+# HEAD 返回非 2xx（不支持或被拒绝）时回退到 GET
+@pytest.mark.parametrize("path", ["nohead", "headblocked"])
+def test_head_falls_back_to_get(config, page_server, path):
+    config.http.probe_mode = "head"
+    source, valid = check_source_url(make_source(f"{page_server}/{path}"), config)
+    assert valid
+    assert source.book_source_name == "小说站"
+
+
+# 样本足够后按延迟百分位设置对冲阈值（50 ms）
+def warm_up(session):
+    for _ in range(20):
+        session.record(50)
+
+
+# 首次请求过慢 → 发出对冲请求并先返回，两次请求的流量都计入统计
+def test_slow_request_is_hedged(config, page_server):
+    config.http.hedge = True
+    with ProbeSession(config, 20) as session:
+        warm_up(session)
+        source, valid = check_source_url(
+            make_source(f"{page_server}/slow"), config, session
+        )
+        session.executor.shutdown(wait=True)  # 等待落后的首次请求完成
+    assert valid
+    assert (session.hedges, session.hedge_wins) == (1, 1)
+    assert session.bytes_received == source.bytes_received * 2
+
+
+# 重试和对冲总次数不超过全局预算
+def test_budgets_cap_retries_and_hedges(config, page_server):
+    config.http.hedge = True
+    config.http.retry_budget = 0.1
+    config.http.hedge_budget = 0.1
+    with ProbeSession(config, 10) as session:
+        warm_up(session)
+        for i in range(3):
+            source = make_source(f"{page_server}/reset{i}")
+            assert not check_source_url(source, config, session)[1]
+        for i in range(3):
+            source = make_source(f"{page_server}/slow{i}")
+            assert check_source_url(source, config, session)[1]
+    assert session.retries == 1
+    assert session.hedges == 1
+
+
+# 连接被重置 → 重试后成功
+def test_reset_connection_is_retried(config, page_server):
+    with ProbeSession(config, 10) as session:
+        source, valid = check_source_url(
+            make_source(f"{page_server}/flaky"), config, session
+        )
+    assert valid
+    assert session.retries == 1
+
+
+# 域名不存在 → 不消耗重试预算
+def test_dns_failure_is_not_retried(config):
+    with ProbeSession(config, 10) as session:
+        source, valid = check_source_url(
+            make_source("http://book.invalid/"), config, session
+        )
+    assert not valid
+    assert session.retries == 0